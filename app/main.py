@@ -6,6 +6,7 @@ from fastapi.responses import HTMLResponse
 import logging
 
 from app.routers import candidates, prediction, session
+from app.services.request_recorder import recording_middleware
 
 app = FastAPI()
 
@@ -19,6 +20,9 @@ async def log_requests(request, call_next):
     logging.info(f"📤 Response status: {response.status_code}")
     return response
 
+# Record anonymized request/response pairs when REQUEST_RECORDING_PATH is set
+app.middleware("http")(recording_middleware())
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
-import pandas as pd 
+import numpy as np
 import ast
 
-from app.services.data_loader import load_candidates
+from app.services.candidate_ranking import rank_candidates
+from app.services.candidate_store import get_candidate_rows, get_prediction_rows, sample_candidate_ids
+from app.services.prediction_cache import prediction_cache
 from app.services.prediction_service import load_model, predict_candidate
-from app.routers.prediction import load_static_predictions
+from app.services.request_recorder import request_seed
+from app.services.study_analytics import study_analytics
 
 router = APIRouter()
 
@@ -20,122 +23,190 @@ invited_candidates = set()
 
 class InviteRequest(BaseModel):
     candidate_id: int
+    session_id: str | None = None
 
 
-@router.get("/candidates/data", tags=["Candidates"])
-def get_candidates_data(exclude_ids: list[int] = Query([], alias="exclude")):
-    try:
-        global invited_candidates, seen_candidates
-
-        # Load candidate data
-        candidates = load_candidates()
-        static_predictions = load_static_predictions()
-
-        # Add new seen candidates to the global tracking set
-        seen_candidates.update(exclude_ids)
-        excluded_candidates = seen_candidates.union(invited_candidates)
-
-        # Remove already seen/invited candidates from the available pool
-        available_candidates = candidates[~candidates["Candidate_ID"].isin(excluded_candidates)]
-        candidates_with = available_candidates[
-            available_candidates["Candidate_ID"].isin(
-                static_predictions[
-                    static_predictions["Modified_Attribute"].isnull() & (static_predictions["GoodFit"] == True)
-                ]["Candidate_ID"]
-            )
-        ]
-        candidates_without = available_candidates[
-            available_candidates["Candidate_ID"].isin(
-                static_predictions[
-                    static_predictions["Modified_Attribute"].isnull() & (static_predictions["GoodFit"] == False)
-                ]["Candidate_ID"]
-            )
+def draw_candidate_fact_sheets(
+    exclude_ids: list,
+    rng: np.random.Generator,
+    include_predictions: bool = False,
+    prefetch: bool = False,
+) -> list:
+    """
+    Draw a good-fit / not-good-fit candidate pair and build their fact sheets.
+
+    Parameters:
+    exclude_ids (list): Candidate IDs the client has already seen.
+    rng (np.random.Generator): Random generator used for sampling and ordering.
+    include_predictions (bool): Attach each candidate's /predict/{candidate_id} payload as "Prediction".
+    prefetch (bool): Warm the candidates' counterfactual results for /predict/update in the background.
+
+    Returns:
+    list: Fact sheets of the selected candidates.
+    """
+    global invited_candidates, seen_candidates
+
+    # Add new seen candidates to the global tracking set
+    seen_candidates.update(exclude_ids)
+    excluded_candidates = seen_candidates.union(invited_candidates)
+
+    # Draw one good-fit and one not-good-fit candidate, reading only the sampled row groups
+    good_fit_ids = sample_candidate_ids(True, n=1, exclude=excluded_candidates, rng=rng)
+    not_good_fit_ids = sample_candidate_ids(False, n=1, exclude=excluded_candidates, rng=rng)
+
+    if good_fit_ids and not_good_fit_ids:
+        selected_ids = good_fit_ids + not_good_fit_ids
+        rng.shuffle(selected_ids)
+    else:
+        selected_ids = sample_candidate_ids(None, n=2, exclude=excluded_candidates, rng=rng)
+
+    candidate_rows = get_candidate_rows(selected_ids)
+    sample_order = {candidate_id: i for i, candidate_id in enumerate(selected_ids)}
+    selected_candidates = candidate_rows.iloc[candidate_rows["Candidate_ID"].map(sample_order).argsort()]
+    static_predictions = get_prediction_rows(selected_ids)
+    if prefetch:
+        prediction_cache.prefetch(selected_ids)
+
+    fact_sheets = []
+    for _, row in selected_candidates.iterrows():
+        nationality = (
+            "US Citizen" if row["CitizenDesc_US Citizen"] == 1 else
+            "Eligible Non-Citizen" if row["CitizenDesc_Eligible NonCitizen"] == 1 else
+            "Non-Citizen" if row["CitizenDesc_Non-Citizen"] == 1 else
+            "Unknown"
+        )
+
+        # Get the original prediction from static predictions
+        pred_row = static_predictions[
+            (static_predictions["Candidate_ID"] == row["Candidate_ID"]) &
+            (static_predictions["Modified_Attribute"].isnull())
         ]
+        if pred_row.empty:
+            raise HTTPException(status_code=404, detail="Original prediction not found for candidate.")
+        pred_row = pred_row.iloc[0]
+        # Ensure TopFeatures is a list (parse if needed)
+        top_features = pred_row["Top_Features"]
+        if not isinstance(top_features, list):
+            # If it's a numpy array, convert it to a list; otherwise, try literal_eval
+            try:
+                if isinstance(top_features, np.ndarray):
+                    top_features = top_features.tolist()
+                else:
+                    top_features = ast.literal_eval(top_features)
+            except Exception:
+                top_features = []
+        prediction_result = {
+            "is_good_fit": bool(pred_row["GoodFit"]),
+            "prediction_probability": float(round(pred_row["Prediction_Probability"], 2)),
+            "top_features": top_features
+        }
+        
+        race_column_mapping = {
+            "White": "RaceDesc_White",
+            "Black or African American": "RaceDesc_Black or African American",
+            "Asian": "RaceDesc_Asian",
+            "American Indian or Alaska Native": "RaceDesc_American Indian or Alaska Native",
+            "Hispanic": "RaceDesc_Hispanic",
+        }
 
-        if not candidates_with.empty and not candidates_without.empty:
-            selected_candidates = pd.concat([candidates_with.sample(n=1), candidates_without.sample(n=1)]).sample(frac=1)
-        elif len(available_candidates) >= 2:
-            selected_candidates = available_candidates.sample(n=2)
-        else:
-            selected_candidates = available_candidates
-
-        fact_sheets = []
-        for _, row in selected_candidates.iterrows():
-            nationality = (
-                "US Citizen" if row["CitizenDesc_US Citizen"] == 1 else
-                "Eligible Non-Citizen" if row["CitizenDesc_Eligible NonCitizen"] == 1 else
-                "Non-Citizen" if row["CitizenDesc_Non-Citizen"] == 1 else
-                "Unknown"
-            )
-
-            # Get the original prediction from static predictions
-            pred_row = static_predictions[
-                (static_predictions["Candidate_ID"] == row["Candidate_ID"]) &
-                (static_predictions["Modified_Attribute"].isnull())
-            ]
-            if pred_row.empty:
-                raise HTTPException(status_code=404, detail="Original prediction not found for candidate.")
-            pred_row = pred_row.iloc[0]
-            # Ensure TopFeatures is a list (parse if needed)
-            top_features = pred_row["Top_Features"]
-            if not isinstance(top_features, list):
-                # If it's a numpy array, convert it to a list; otherwise, try literal_eval
-                try:
-                    import numpy as np
-                    if isinstance(top_features, np.ndarray):
-                        top_features = top_features.tolist()
-                    else:
-                        top_features = ast.literal_eval(top_features)
-                except Exception:
-                    top_features = []
-            prediction_result = {
-                "is_good_fit": bool(pred_row["GoodFit"]),
-                "prediction_probability": float(round(pred_row["Prediction_Probability"], 2)),
-                "top_features": top_features
-            }
-            
-            race_column_mapping = {
-                "White": "RaceDesc_White",
-                "Black or African American": "RaceDesc_Black or African American",
-                "Asian": "RaceDesc_Asian",
-                "American Indian or Alaska Native": "RaceDesc_American Indian or Alaska Native",
-                "Hispanic": "RaceDesc_Hispanic",
+        def get_race(row, mapping):
+            for race, column in mapping.items():
+                if row[column] == 1:
+                    return "Black" if race == "Black or African American" else (
+                        "American Indian" if race == "American Indian or Alaska Native" else race
+                    )
+            return "Unknown"
+
+        fact_sheets.append({
+            "Candidate_ID": row["Candidate_ID"],
+            "Name": row["Employee_Name"].split(", ")[0],
+            "Prename": row["Employee_Name"].split(", ")[1],
+            "Gender": "Female" if row["Sex"] == 0 else "Male",
+            "Nationality": nationality,
+            "Birthplace": row["Birthplace"],
+            "Skills": {
+                "Degree": row["Education"] + 1,
+                "Technical Skills": row["Technical_Skills"],
+                "Certifications": int(row["Certifications_Score"]),
+                "Social Skills": 3,
+            },
+            "Race": get_race(row, race_column_mapping),
+            "Age": row["Age"],
+            "GoodFit": prediction_result["is_good_fit"],
+            "Probability": round(prediction_result["prediction_probability"], 2),
+            "TopFeatures": prediction_result["top_features"]
+        })
+        if include_predictions:
+            fact_sheets[-1]["Prediction"] = {
+                "candidate_id": int(row["Candidate_ID"]),
+                "prediction_probability": prediction_result["prediction_probability"],
+                "is_good_fit": prediction_result["is_good_fit"],
+                "top_features": [
+                    {"Feature": feat["Feature"], "SHAP Value": float(feat["SHAP Value"])}
+                    for feat in prediction_result["top_features"]
+                ]
             }
 
-            def get_race(row, mapping):
-                for race, column in mapping.items():
-                    if row[column] == 1:
-                        return "Black" if race == "Black or African American" else (
-                            "American Indian" if race == "American Indian or Alaska Native" else race
-                        )
-                return "Unknown"
-
-            fact_sheets.append({
-                "Candidate_ID": row["Candidate_ID"],
-                "Name": row["Employee_Name"].split(", ")[0],
-                "Prename": row["Employee_Name"].split(", ")[1],
-                "Gender": "Female" if row["Sex"] == 0 else "Male",
-                "Nationality": nationality,
-                "Birthplace": row["Birthplace"],
-                "Skills": {
-                    "Degree": row["Education"] + 1,
-                    "Technical Skills": row["Technical_Skills"],
-                    "Certifications": int(row["Certifications_Score"]),
-                    "Social Skills": 3,
-                },
-                "Race": get_race(row, race_column_mapping),
-                "Age": row["Age"],
-                "GoodFit": prediction_result["is_good_fit"],
-                "Probability": round(prediction_result["prediction_probability"], 2),
-                "TopFeatures": prediction_result["top_features"]
-            })
-
-        return fact_sheets
+    return fact_sheets
+
+
+@router.get("/candidates/data", tags=["Candidates"])
+def get_candidates_data(
+    request: Request,
+    exclude_ids: list[int] = Query([], alias="exclude"),
+    user_group: str | None = None,
+):
+    try:
+        rng = np.random.default_rng(request_seed(request))
+        # Only the interactive group can trigger counterfactual predictions
+        return draw_candidate_fact_sheets(exclude_ids, rng, prefetch=user_group == "interactive")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"{e.__traceback__.tb_lineno},{str(type(e).__name__)}: {str(e)}")
     
 
+@router.get("/candidates/ranked", tags=["Candidates"])
+def get_ranked_candidates(
+    limit: int = Query(10, ge=1, le=500),
+    cursor: int | None = Query(None, ge=0),
+    position: str | None = None,
+    min_experience: float | None = None,
+    max_experience: float | None = None,
+    sex: int | None = None,
+    race: str | None = None,
+    age_group: str | None = None,
+):
+    """
+    Return the candidates the model ranks highest, optionally filtered by position, experience
+    or protected attributes.
+
+    Parameters:
+    limit (int): Page size.
+    cursor (int): next_cursor of the previous page.
+    position (str): Position name, e.g. "Data Analyst".
+    min_experience / max_experience (float): Inclusive YearsExperience range.
+    sex (int): Encoded Sex value (0 = Female, 1 = Male).
+    race (str): Race name, e.g. "Asian".
+    age_group (str): Age group, e.g. "30-40".
+
+    Returns:
+    JSON: Ranked page of candidates with probabilities, total matches and the next cursor.
+    """
+    try:
+        return rank_candidates(
+            limit=limit,
+            cursor=cursor,
+            position=position,
+            min_experience=min_experience,
+            max_experience=max_experience,
+            sex=sex,
+            race=race,
+            age_group=age_group,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{e.__traceback__.tb_lineno},{str(type(e).__name__)}: {str(e)}")
+
+
 @router.get("/candidates", response_class=HTMLResponse, tags=["Candidates"])
 def show_candidates_frontend(): # TODO: modify frontend serving to show one recommended and one not-recommended candidate?
     """
@@ -155,12 +226,17 @@ def invite_candidate(invite_data: InviteRequest):
     Store an invited candidate in memory so they are never shown again.
 
     Parameters:
-    invite_data (InviteRequest): The candidate ID wrapped in a Pydantic model.
+    invite_data (InviteRequest): The candidate ID and, optionally, the session ID wrapped in a Pydantic model.
     """
     try:
         global invited_candidates
         candidate_id = invite_data.candidate_id  # Extract from request body
         invited_candidates.add(candidate_id)
+
+        prediction_rows = get_prediction_rows([candidate_id])
+        original_row = prediction_rows[prediction_rows["Modified_Attribute"].isnull()]
+        is_good_fit = bool(original_row["GoodFit"].iloc[0]) if not original_row.empty else False
+        study_analytics.record_invite(invite_data.session_id, is_good_fit)
         return {"message": f"Candidate {candidate_id} invited successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
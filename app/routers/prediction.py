@@ -1,10 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import pandas as pd
-import random
-from functools import lru_cache
 
-from app.services.data_loader import load_candidates
+from app.services.candidate_store import get_candidate_rows, get_prediction_rows
+from app.services.prediction_cache import ORIGINAL_KEY, prediction_cache
 from app.services.prediction_service import load_model, predict_candidate
 
 
@@ -12,18 +11,20 @@ router = APIRouter()
 
 # Load the pre-trained XGBoost model at the startup
 xgb_model = load_model()
-STATIC_PREDICTIONS_PATH = "app/data/static_predictions.parquet"
 
 class PredictionRequest(BaseModel):
     candidate_id: int
     updated_features: dict  # e.g. {"Sex": 1} or {"Age": "50-60"} or {"RaceDesc_Black or African American": 1, "RaceDesc_White": 0, "RaceDesc_Asian": 0}
 
 
-@lru_cache(maxsize=1)
-def load_static_predictions() -> pd.DataFrame:
-    """Load and cache the static predictions dataset."""
-    df = pd.read_parquet(STATIC_PREDICTIONS_PATH)
-    return df
+
+def _load_prediction_rows(candidate_id: int) -> pd.DataFrame:
+    """Read a candidate's prediction rows after a cache miss and cache the full result set."""
+    candidate_prediction_rows = get_prediction_rows([candidate_id])
+    if not candidate_prediction_rows.empty:
+        prediction_cache.put(candidate_id, candidate_prediction_rows)
+    return candidate_prediction_rows
+
 
 def get_age_group(age: float) -> str:
     if age < 30:
@@ -39,18 +40,15 @@ def get_age_group(age: float) -> str:
     
 
 @router.post("/predict/update", tags=["Prediction"])
-def update_prediction(request: PredictionRequest, static_predictions: pd.DataFrame = Depends(load_static_predictions)):
+def update_prediction(request: PredictionRequest):
     try:
-        # Load the candidate data
-        candidates = load_candidates()
         print(f"DEBUG request: {request}")
-        # Find the candidate in the dataset
-        baseline_candidate = candidates[candidates["Candidate_ID"] == request.candidate_id]
+        # Find the candidate, reading only the row group that holds it
+        baseline_candidate = get_candidate_rows([request.candidate_id])
         if baseline_candidate.empty:
             raise HTTPException(status_code=404, detail="Candidate not found.")
 
         baseline_candidate = baseline_candidate.iloc[0].copy()  # Extract row as mutable Series
-        candidate_prediction_rows = static_predictions[static_predictions["Candidate_ID"] == request.candidate_id]
 
         # Define the set of modifiable attributes (keys expected in updated_features)
         modifiable_attributes = ["Sex", "Age", "RaceDesc_White", "RaceDesc_Black or African American", "RaceDesc_Asian"]
@@ -75,6 +73,14 @@ def update_prediction(request: PredictionRequest, static_predictions: pd.DataFra
         
         # If no difference detected, return the original prediction.
         if not differences:
+            cached_prediction = prediction_cache.get(request.candidate_id, ORIGINAL_KEY)
+            if cached_prediction is not None:
+                return cached_prediction
+            if prediction_cache.contains(request.candidate_id):
+                # The cached result set is complete, so the row does not exist
+                raise HTTPException(status_code=404, detail="Original prediction not found.")
+
+            candidate_prediction_rows = _load_prediction_rows(request.candidate_id)
             original_row = candidate_prediction_rows[candidate_prediction_rows["Modified_Attribute"].isnull()]
             if original_row.empty:
                 raise HTTPException(status_code=404, detail="Original prediction not found.")
@@ -127,6 +133,16 @@ def update_prediction(request: PredictionRequest, static_predictions: pd.DataFra
             baseline_age_group = get_age_group(float(baseline_candidate["Age"]))
             # new_value_str is already an age group like "40-50"
         
+        # Counterfactual result sets of the candidates on screen are prefetched in the background
+        cached_prediction = prediction_cache.get(request.candidate_id, (mod_attribute, new_value_str))
+        if cached_prediction is not None:
+            return cached_prediction
+        if prediction_cache.contains(request.candidate_id):
+            # The cached result set is complete, so no counterfactual exists for this change
+            raise HTTPException(status_code=404, detail="No precomputed counterfactual prediction found for the updated attribute.")
+
+        candidate_prediction_rows = _load_prediction_rows(request.candidate_id)
+
         # Build the query: for race modifications, use New_Race_Column; for others, use New_Value.
         if mod_attribute == "Race":
             query = (
@@ -166,8 +182,19 @@ def update_prediction(request: PredictionRequest, static_predictions: pd.DataFra
         raise HTTPException(status_code=500, detail=f"{e.__traceback__.tb_lineno}, {str(type(e).__name__)}: {str(e)}")
 
 
+@router.get("/predict/prefetch/stats", tags=["Prediction"])
+def prefetch_stats():
+    """
+    Report hit-rate and wasted-work metrics of the counterfactual prefetcher.
+
+    Returns:
+    JSON: Prefetch, hit, miss and eviction counters with derived rates.
+    """
+    return prediction_cache.stats()
+
+
 @router.get("/predict/{candidate_id}", tags=["Prediction"])
-def predict_candidate_api(candidate_id: int, static_predictions: pd.DataFrame = Depends(load_static_predictions)):
+def predict_candidate_api(candidate_id: int):
     """
     Predict if a selected candidate is a good fit.
 
@@ -178,7 +205,7 @@ def predict_candidate_api(candidate_id: int, static_predictions: pd.DataFrame =
     JSON: Prediction result for the candidate.
     """
     try:
-        candidate_prediction_rows = static_predictions[static_predictions["Candidate_ID"] == candidate_id]
+        candidate_prediction_rows = get_prediction_rows([candidate_id])
         if candidate_prediction_rows.empty:
             raise HTTPException(status_code=404, detail="Candidate not found.")
         
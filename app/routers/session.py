@@ -1,18 +1,29 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import uuid
+import random
+import secrets
 import datetime
+import numpy as np
 from supabase import create_client
 import os
 from dotenv import load_dotenv
 from postgrest.exceptions import APIError
 
+from app.routers.candidates import draw_candidate_fact_sheets
+from app.services.request_recorder import request_seed
+from app.services.session_results import EXPORT_FORMATS, SESSION_RESULTS_TABLE, export_session_results
+from app.services.study_analytics import study_analytics
+
 router = APIRouter()
 
 # Load env
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Bulk export of study data is disabled unless a token is configured
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Supabase URL or Key missing. Check .env file.")
@@ -37,28 +48,50 @@ class SessionEndRequest(BaseModel):
 class SessionIdRequest(BaseModel):
     session_id: str
 
+class RoundNextRequest(BaseModel):
+    session_id: str
+    exclude: list[int] = []
+
+
+# ----------- HELPERS -----------
+
+def _count_round(session_id: str):
+    """Increment rounds_played and feed the time since the previous round start to the analytics."""
+    session = sessions[session_id]
+    now = datetime.datetime.utcnow()
+    previous_round_seconds = (now - session["round_started"]).total_seconds() if session.get("round_started") else None
+    session["rounds_played"] += 1
+    session["round_started"] = now
+    study_analytics.record_round_start(session["user_group"], previous_round_seconds)
+
 
 # ----------- ROUTES -----------
 
 @router.post("/session/start", tags=["Session"])
-def start_session(user_id: str = None):
-    session_id = str(uuid.uuid4())
+def start_session(request: Request, user_id: str = None):
+    # Seeded during recording/replay so session IDs and group assignment are reproducible,
+    # otherwise drawn from the OS like before
+    seed = request_seed(request)
+    rng = random.Random(seed) if seed is not None else random.SystemRandom()
+    session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
     start_time = datetime.datetime.utcnow()
     user_groups = ["no-xai", "badge", "predictions", "interactive"]
 
     # Defensive: prevent duplicate session_id use
     while session_id in sessions:
-        session_id = str(uuid.uuid4())
+        session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
 
-    assigned_group = user_groups[uuid.uuid4().int % len(user_groups)]
+    assigned_group = user_groups[rng.randrange(len(user_groups))]
 
     sessions[session_id] = {
         "start": start_time,
         "end": None,
         "user_id": user_id,
         "rounds_played": 0,
+        "round_started": None,
         "user_group": assigned_group
     }
+    study_analytics.record_session_start(session_id, assigned_group)
 
     return {
         "session_id": session_id,
@@ -76,6 +109,7 @@ def reinit_session(payload: SessionIdRequest):
         raise HTTPException(status_code=404, detail="Session not found in memory")
 
     sessions[session_id]["rounds_played"] = 0
+    sessions[session_id]["round_started"] = None
     return {"success": True, "message": "Session state reset."}
 
 
@@ -100,12 +134,46 @@ def end_session(payload: SessionEndRequest):
 
     try:
         print("Attempting to insert:", session_data)
-        response = supabase.table("session_results").insert(session_data).execute()
-        return {"success": True, "data": response.data}
+        response = supabase.table(SESSION_RESULTS_TABLE).insert(session_data).execute()
     except APIError as e:
         print("Supabase error:", e)
         raise HTTPException(status_code=500, detail=f"Supabase insert error: {e}")
 
+    # Count the session only once it is stored, so a retried failed insert is not counted twice
+    session = sessions[session_id]
+    final_round_seconds = (end_time - session["round_started"]).total_seconds() if session.get("round_started") else None
+    session["round_started"] = None
+    study_analytics.record_session_end(session_id, session["user_group"], elapsed, final_round_seconds)
+    return {"success": True, "data": response.data}
+
+
+@router.get("/session/export", tags=["Session"])
+def export_sessions(
+    format: str = Query("ndjson", pattern="^(ndjson|arrow)$"),
+    user_group: str | None = None,
+    since: datetime.datetime | None = None,
+    until: datetime.datetime | None = None,
+    authorization: str | None = Header(None),
+):
+    """
+    Stream stored session results as chunked NDJSON or an Arrow IPC stream.
+
+    Rows are paged from the session-results table and encoded page by page, so memory use does
+    not grow with the number of stored sessions. Requires "Authorization: Bearer <EXPORT_TOKEN>".
+    """
+    if not EXPORT_TOKEN or not secrets.compare_digest(
+        (authorization or "").encode("utf-8"), f"Bearer {EXPORT_TOKEN}".encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Export not authorized.")
+
+    chunks = export_session_results(supabase, format, user_group=user_group, since=since, until=until)
+    extension = "ndjson" if format == "ndjson" else "arrows"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="session_results.{extension}"'},
+    )
+
 
 @router.post("/round/start", tags=["Round"])
 def start_round(payload: SessionIdRequest):
@@ -117,10 +185,48 @@ def start_round(payload: SessionIdRequest):
     if sessions[session_id]["rounds_played"] >= MAX_ROUNDS:
         raise HTTPException(status_code=400, detail="Maximum number of rounds reached")
 
-    sessions[session_id]["rounds_played"] += 1
+    _count_round(session_id)
     return {"success": True, "round_number": sessions[session_id]["rounds_played"]}
 
 
+@router.post("/round/next", tags=["Round"])
+def next_round(payload: RoundNextRequest, request: Request):
+    """
+    Start the next round in a single call: validate the session, draw the candidate pair with
+    predictions and explanations attached, and return the user group.
+
+    Combines /round/start, /candidates/data, /predict/{candidate_id} and /session/group.
+    """
+    session_id = payload.session_id
+
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found in memory")
+
+    if sessions[session_id]["rounds_played"] >= MAX_ROUNDS:
+        raise HTTPException(status_code=400, detail="Maximum number of rounds reached")
+
+    try:
+        rng = np.random.default_rng(request_seed(request))
+        # Only the interactive group can trigger counterfactual predictions
+        candidates = draw_candidate_fact_sheets(
+            payload.exclude,
+            rng,
+            include_predictions=True,
+            prefetch=sessions[session_id]["user_group"] == "interactive",
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{e.__traceback__.tb_lineno},{str(type(e).__name__)}: {str(e)}")
+
+    # Only count the round once its candidates could be drawn
+    _count_round(session_id)
+    return {
+        "success": True,
+        "round_number": sessions[session_id]["rounds_played"],
+        "user_group": sessions[session_id]["user_group"],
+        "candidates": candidates
+    }
+
+
 @router.post("/candidates/reset", tags=["Round"])
 def reset_candidates(payload: SessionIdRequest):
     session_id = payload.session_id
@@ -129,10 +235,20 @@ def reset_candidates(payload: SessionIdRequest):
         raise HTTPException(status_code=404, detail="Session not found in memory")
 
     sessions[session_id]["rounds_played"] = 0
+    sessions[session_id]["round_started"] = None
     print(f"[RESET] rounds_played reset for session {session_id}")
     return {"success": True, "message": f"Session {session_id} reset."}
 
 
+@router.get("/session/analytics", tags=["Session"])
+def get_study_analytics():
+    """
+    Return running per-user-group statistics: invite and good-fit pick rates, rounds and
+    round/session time quantiles (seconds), maintained incrementally since server start.
+    """
+    return study_analytics.snapshot()
+
+
 @router.get("/session/group", tags=["Session"])
 def get_user_group(session_id: str = Query(...)):
     if session_id not in sessions:
@@ -0,0 +1,219 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from app.services.candidate_store import CANDIDATES_PATH, PREDICTIONS_PATH
+
+POSITION_PREFIX = "Position_"
+RACE_PREFIX = "RaceDesc_"
+AGE_BINS = [30, 40, 50, 60]
+AGE_GROUPS = ["20-30", "30-40", "40-50", "50-60", ">60"]
+# Filter combinations whose matching ranks are kept, so paging through them is a binary search
+MATCH_CACHE_SIZE = 64
+
+
+def _grouped_ranks(labels: np.ndarray) -> dict:
+    """
+    Index ranks by label.
+
+    Parameters:
+    labels (np.ndarray): One label per rank, in rank order.
+
+    Returns:
+    dict: label -> ascending array of the ranks carrying that label.
+    """
+    if len(labels) == 0:
+        return {}
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    boundaries = np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1
+    return {
+        label.item() if isinstance(label, np.generic) else label: ranks
+        for label, ranks in zip(sorted_labels[np.r_[0, boundaries]], np.split(order, boundaries))
+    }
+
+
+@lru_cache(maxsize=1)
+def load_ranking_index(candidates_path: str = CANDIDATES_PATH, predictions_path: str = PREDICTIONS_PATH) -> dict:
+    """
+    Build the ranking index over the whole pool.
+
+    Candidates are ordered by original prediction probability (descending, ties by Candidate_ID),
+    so a candidate's rank is its position in that order. Categorical filters are stored as
+    ascending rank arrays, YearsExperience per rank and as ranks sorted by experience for range
+    lookups.
+
+    Parameters:
+    candidates_path (str): Path to the candidate parquet file.
+    predictions_path (str): Path to the static predictions parquet file.
+
+    Returns:
+    dict: Ranked arrays ("candidate_id", "probability", "good_fit", "years"), the experience index
+    and per-label rank arrays for position, sex, race and age group.
+    """
+    predictions = pd.read_parquet(
+        predictions_path,
+        columns=["Candidate_ID", "Modified_Attribute", "Prediction_Probability", "GoodFit"],
+    )
+    predictions = predictions[predictions["Modified_Attribute"].isnull()].drop(columns="Modified_Attribute")
+
+    candidate_columns = pq.ParquetFile(candidates_path).schema_arrow.names
+    position_columns = [c for c in candidate_columns if c.startswith(POSITION_PREFIX)]
+    race_columns = [c for c in candidate_columns if c.startswith(RACE_PREFIX)]
+    candidates = pd.read_parquet(
+        candidates_path,
+        columns=["Candidate_ID", "YearsExperience", "Sex", "Age"] + position_columns + race_columns,
+    )
+
+    ranked = predictions.merge(candidates, on="Candidate_ID", how="inner")
+    ranked = ranked.sort_values(
+        ["Prediction_Probability", "Candidate_ID"], ascending=[False, True], kind="stable"
+    ).reset_index(drop=True)
+
+    def one_hot_labels(columns: list, prefix: str) -> np.ndarray:
+        if not columns:
+            return np.full(len(ranked), "Unknown", dtype=object)
+        values = ranked[columns].to_numpy()
+        names = np.array([c[len(prefix):] for c in columns] + ["Unknown"], dtype=object)
+        # Rows without a set flag fall through to "Unknown"
+        codes = np.where(values.max(axis=1) == 1, values.argmax(axis=1), len(columns))
+        return names[codes]
+
+    years = ranked["YearsExperience"].to_numpy(dtype=float)
+    years_order = np.argsort(years, kind="stable")
+    age_groups = np.array(AGE_GROUPS, dtype=object)[np.searchsorted(AGE_BINS, ranked["Age"].to_numpy(), side="right")]
+
+    return {
+        "candidate_id": ranked["Candidate_ID"].to_numpy(),
+        "probability": ranked["Prediction_Probability"].to_numpy(dtype=float),
+        "good_fit": ranked["GoodFit"].to_numpy(dtype=bool),
+        "years": years,
+        "years_sorted": years[years_order],
+        "years_ranks": years_order,
+        "position": _grouped_ranks(one_hot_labels(position_columns, POSITION_PREFIX)),
+        "race": _grouped_ranks(one_hot_labels(race_columns, RACE_PREFIX)),
+        "sex": _grouped_ranks(ranked["Sex"].to_numpy().astype(int)),
+        "age_group": _grouped_ranks(age_groups),
+    }
+
+
+def _contains_sorted(sorted_ranks: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """Return a mask of the ranks present in an ascending rank array, by binary search."""
+    positions = np.searchsorted(sorted_ranks, ranks)
+    found = positions < len(sorted_ranks)
+    found[found] = sorted_ranks[positions[found]] == ranks[found]
+    return found
+
+
+@lru_cache(maxsize=MATCH_CACHE_SIZE)
+def _matching_ranks(
+    position: str = None,
+    sex: int = None,
+    race: str = None,
+    age_group: str = None,
+    min_experience: float = None,
+    max_experience: float = None,
+) -> np.ndarray:
+    """
+    Return the ascending ranks matching all given filters; at least one must be categorical.
+
+    The smallest categorical rank array is walked and its ranks tested for membership in the
+    others, so the result stays in rank order and later pages are a binary search away.
+
+    Returns:
+    np.ndarray: Ascending ranks of the matching candidates.
+    """
+    index = load_ranking_index()
+    empty = np.array([], dtype=np.int64)
+    rank_sets = [
+        index[name].get(value, empty)
+        for name, value in (("position", position), ("sex", sex), ("race", race), ("age_group", age_group))
+        if value is not None
+    ]
+    rank_sets.sort(key=len)
+    matches = rank_sets[0]
+    for ranks in rank_sets[1:]:
+        matches = matches[_contains_sorted(ranks, matches)]
+    if min_experience is not None or max_experience is not None:
+        years = index["years"][matches]
+        in_range = np.ones(len(matches), dtype=bool)
+        if min_experience is not None:
+            in_range &= years >= min_experience
+        if max_experience is not None:
+            in_range &= years <= max_experience
+        matches = matches[in_range]
+    return matches
+
+
+def rank_candidates(
+    limit: int = 10,
+    cursor: int = None,
+    position: str = None,
+    min_experience: float = None,
+    max_experience: float = None,
+    sex: int = None,
+    race: str = None,
+    age_group: str = None,
+) -> dict:
+    """
+    Return the highest-ranked candidates matching the filters, one page at a time.
+
+    Parameters:
+    limit (int): Page size.
+    cursor (int): Rank of the last candidate of the previous page, None for the first page.
+    position (str): Position name without prefix, e.g. "Data Analyst".
+    min_experience (float): Minimum YearsExperience (inclusive).
+    max_experience (float): Maximum YearsExperience (inclusive).
+    sex (int): Encoded Sex value as stored in the data.
+    race (str): Race name without prefix, e.g. "Asian".
+    age_group (str): Age group, e.g. "30-40".
+
+    Returns:
+    dict: The page of candidates, the total number of matches and the cursor of the next page.
+    """
+    index = load_ranking_index()
+    has_category = any(value is not None for value in (position, sex, race, age_group))
+    has_experience = min_experience is not None or max_experience is not None
+
+    if has_category:
+        # Matches are cached in rank order: the page is the slice after the cursor
+        matches = _matching_ranks(position, sex, race, age_group, min_experience, max_experience)
+        total = len(matches)
+        start = 0 if cursor is None else np.searchsorted(matches, cursor, side="right")
+        page = matches[start:start + limit]
+        has_more = start + limit < total
+    elif has_experience:
+        # Experience ranks are ordered by years, not rank: top-k selection over those after the
+        # cursor, so only the k best ranks get sorted
+        lo = 0 if min_experience is None else np.searchsorted(index["years_sorted"], min_experience, side="left")
+        hi = len(index["years_sorted"]) if max_experience is None else np.searchsorted(index["years_sorted"], max_experience, side="right")
+        matches = index["years_ranks"][lo:hi]
+        total = len(matches)
+        remaining = matches if cursor is None else matches[matches > cursor]
+        if len(remaining) > limit:
+            page = np.sort(remaining[np.argpartition(remaining, limit - 1)[:limit]])
+        else:
+            page = np.sort(remaining)
+        has_more = len(remaining) > limit
+    else:
+        # Unfiltered: the pool itself is in rank order
+        total = len(index["candidate_id"])
+        start = 0 if cursor is None else cursor + 1
+        page = np.arange(start, min(start + limit, total))
+        has_more = start + limit < total
+
+    return {
+        "candidates": [
+            {
+                "rank": int(rank) + 1,
+                "candidate_id": int(index["candidate_id"][rank]),
+                "prediction_probability": float(round(index["probability"][rank], 2)),
+                "is_good_fit": bool(index["good_fit"][rank]),
+            }
+            for rank in page
+        ],
+        "total": int(total),
+        "next_cursor": int(page[-1]) if has_more else None,
+    }
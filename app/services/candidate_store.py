@@ -0,0 +1,299 @@
+import json
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CANDIDATES_PATH = "app/data/static_data.parquet"
+PREDICTIONS_PATH = "app/data/static_predictions.parquet"
+SORT_KEY = "Candidate_ID"
+DEFAULT_ROW_GROUP_SIZE = 4096
+ROW_GROUP_CACHE_SIZE = 64
+MAX_SAMPLE_ATTEMPTS = 32
+
+_read_lock = threading.Lock()
+
+
+def _index_path(path: str) -> str:
+    """Return the sidecar index path for a parquet file."""
+    return f"{path}.index.json"
+
+
+def _pool_counts(table: pa.Table) -> tuple:
+    """
+    Count original (non-counterfactual) good-fit and not-good-fit rows in a predictions table.
+
+    Parameters:
+    table (pa.Table): A predictions table or row group.
+
+    Returns:
+    tuple: (good-fit count, not-good-fit count), (0, 0) if the table has no GoodFit column.
+    """
+    if "GoodFit" not in table.column_names or "Modified_Attribute" not in table.column_names:
+        return 0, 0
+    is_original = table.column("Modified_Attribute").is_null().to_numpy(zero_copy_only=False)
+    good_fit = table.column("GoodFit").to_numpy(zero_copy_only=False).astype(bool)
+    return int((is_original & good_fit).sum()), int((is_original & ~good_fit).sum())
+
+
+def write_indexed_parquet(df: pd.DataFrame, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> dict:
+    """
+    Write a DataFrame sorted and row-grouped by Candidate_ID, together with its sidecar index.
+
+    Parameters:
+    df (pd.DataFrame): Candidate or prediction data containing a Candidate_ID column.
+    path (str): Target parquet path. The index is written to "<path>.index.json".
+    row_group_size (int): Maximum number of rows per row group.
+
+    Returns:
+    dict: The sidecar index that was written.
+    """
+    if SORT_KEY not in df.columns:
+        raise ValueError(f"Column {SORT_KEY} missing, cannot build an indexed store for {path}")
+
+    df = df.sort_values(SORT_KEY, kind="stable").reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, path, row_group_size=row_group_size)
+
+    row_groups = []
+    for start in range(0, table.num_rows, row_group_size):
+        chunk = table.slice(start, row_group_size)
+        ids = chunk.column(SORT_KEY).to_numpy(zero_copy_only=False)
+        good_fit, not_good_fit = _pool_counts(chunk)
+        row_groups.append({
+            "min_id": int(ids.min()),
+            "max_id": int(ids.max()),
+            "num_rows": chunk.num_rows,
+            "good_fit": good_fit,
+            "not_good_fit": not_good_fit,
+        })
+
+    index = {"sort_key": SORT_KEY, "num_rows": table.num_rows, "row_groups": row_groups}
+    with open(_index_path(path), "w") as file:
+        json.dump(index, file)
+
+    _load_index.cache_clear()
+    _open_parquet.cache_clear()
+    _read_row_group.cache_clear()
+    return index
+
+
+def build_candidate_store(
+    candidates_path: str = CANDIDATES_PATH,
+    predictions_path: str = PREDICTIONS_PATH,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> None:
+    """
+    Rewrite the candidate and prediction files in place as indexed stores.
+
+    Parameters:
+    candidates_path (str): Path to the candidate parquet file.
+    predictions_path (str): Path to the static predictions parquet file.
+    row_group_size (int): Maximum number of rows per row group.
+    """
+    for path in (candidates_path, predictions_path):
+        write_indexed_parquet(pd.read_parquet(path), path, row_group_size=row_group_size)
+
+
+@lru_cache(maxsize=4)
+def _open_parquet(path: str) -> pq.ParquetFile:
+    """Open and cache a parquet file handle."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found at {path}")
+    return pq.ParquetFile(path)
+
+
+@lru_cache(maxsize=4)
+def _load_index(path: str) -> dict:
+    """
+    Load the sidecar index of a parquet file as numpy arrays.
+
+    Files without a sidecar (e.g. not yet rebuilt with build_candidate_store) get an index
+    derived from the parquet row group statistics and a single scan of the pool columns.
+
+    Parameters:
+    path (str): Path to the parquet file.
+
+    Returns:
+    dict: Arrays "min_id", "max_id", "good_fit" and "not_good_fit", one entry per row group.
+    """
+    if os.path.exists(_index_path(path)):
+        with open(_index_path(path), "r") as file:
+            row_groups = json.load(file)["row_groups"]
+    else:
+        parquet_file = _open_parquet(path)
+        key_idx = parquet_file.schema_arrow.get_field_index(SORT_KEY)
+        columns = [c for c in (SORT_KEY, "GoodFit", "Modified_Attribute") if c in parquet_file.schema_arrow.names]
+        row_groups = []
+        for i in range(parquet_file.num_row_groups):
+            chunk = parquet_file.read_row_group(i, columns=columns)
+            stats = parquet_file.metadata.row_group(i).column(key_idx).statistics
+            if stats is not None and stats.has_min_max:
+                min_id, max_id = int(stats.min), int(stats.max)
+            else:
+                ids = chunk.column(SORT_KEY).to_numpy(zero_copy_only=False)
+                min_id, max_id = int(ids.min()), int(ids.max())
+            good_fit, not_good_fit = _pool_counts(chunk)
+            row_groups.append({"min_id": min_id, "max_id": max_id, "good_fit": good_fit, "not_good_fit": not_good_fit})
+
+    return {
+        key: np.array([group[key] for group in row_groups], dtype=np.int64)
+        for key in ("min_id", "max_id", "good_fit", "not_good_fit")
+    }
+
+
+@lru_cache(maxsize=ROW_GROUP_CACHE_SIZE)
+def _read_row_group(path: str, row_group: int) -> pd.DataFrame:
+    """Read and cache a single row group as a DataFrame."""
+    parquet_file = _open_parquet(path)
+    with _read_lock:
+        table = parquet_file.read_row_group(row_group)
+    return table.to_pandas()
+
+
+def _row_groups_for_ids(path: str, candidate_ids: list) -> np.ndarray:
+    """Return the indices of the row groups that may contain any of the given IDs."""
+    index = _load_index(path)
+    ids = np.asarray(candidate_ids, dtype=np.int64)[:, None]
+    hits = (index["min_id"] <= ids) & (index["max_id"] >= ids)
+    return np.flatnonzero(hits.any(axis=0))
+
+
+def _read_rows(path: str, candidate_ids: list) -> pd.DataFrame:
+    """
+    Read all rows for the given candidate IDs, touching only the row groups that contain them.
+
+    Parameters:
+    path (str): Path to an indexed parquet file.
+    candidate_ids (list): Candidate IDs to look up.
+
+    Returns:
+    pd.DataFrame: Matching rows, empty if none are found.
+    """
+    frames = []
+    for row_group in _row_groups_for_ids(path, candidate_ids):
+        chunk = _read_row_group(path, int(row_group))
+        frames.append(chunk[chunk[SORT_KEY].isin(candidate_ids)])
+    if not frames:
+        return _open_parquet(path).schema_arrow.empty_table().to_pandas()
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_candidate_rows(candidate_ids: list, path: str = CANDIDATES_PATH) -> pd.DataFrame:
+    """
+    Look up candidate rows by ID.
+
+    Parameters:
+    candidate_ids (list): Candidate IDs to look up.
+    path (str): Path to the candidate parquet file.
+
+    Returns:
+    pd.DataFrame: Candidate rows for the given IDs.
+    """
+    return _read_rows(path, list(candidate_ids))
+
+
+def get_prediction_rows(candidate_ids: list, path: str = PREDICTIONS_PATH) -> pd.DataFrame:
+    """
+    Look up the original and counterfactual prediction rows by candidate ID.
+
+    Parameters:
+    candidate_ids (list): Candidate IDs to look up.
+    path (str): Path to the static predictions parquet file.
+
+    Returns:
+    pd.DataFrame: Prediction rows for the given IDs.
+    """
+    return _read_rows(path, list(candidate_ids))
+
+
+def sample_candidate_ids(
+    good_fit,
+    n: int = 1,
+    exclude: set = frozenset(),
+    rng: np.random.Generator = None,
+    path: str = PREDICTIONS_PATH,
+) -> list:
+    """
+    Sample candidate IDs from the good-fit or not-good-fit pool.
+
+    Rejection sampling keeps the draw uniform over the eligible candidates: a row group is drawn
+    with probability proportional to its full pool size, a candidate uniformly from that pool, and
+    the draw is retried if the candidate is excluded. Only the sampled row groups are read. When
+    most of the pool is excluded and retries run out, the remaining draws are weighted by the
+    exact number of eligible candidates per row group, which reads every non-empty row group once.
+
+    Parameters:
+    good_fit (bool | None): Pool to sample from, None samples from both pools.
+    n (int): Number of distinct candidate IDs to return.
+    exclude (set): Candidate IDs that must not be returned (e.g. seen or invited).
+    rng (np.random.Generator): Random generator, a fresh one is created if None.
+    path (str): Path to the static predictions parquet file.
+
+    Returns:
+    list: Up to n candidate IDs, fewer if the pool is exhausted.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    index = _load_index(path)
+    if good_fit is None:
+        weights = (index["good_fit"] + index["not_good_fit"]).astype(float)
+    else:
+        weights = index["good_fit" if good_fit else "not_good_fit"].astype(float)
+    if weights.sum() == 0:
+        return []
+
+    def pool_ids(row_group: int) -> np.ndarray:
+        chunk = _read_row_group(path, row_group)
+        pool = chunk[chunk["Modified_Attribute"].isnull()]
+        if good_fit is not None:
+            pool = pool[pool["GoodFit"] == good_fit]
+        return pool[SORT_KEY].to_numpy()
+
+    selected = []
+    attempts = 0
+    while len(selected) < n and attempts < MAX_SAMPLE_ATTEMPTS:
+        attempts += 1
+        row_group = int(rng.choice(len(weights), p=weights / weights.sum()))
+        candidate_id = int(rng.choice(pool_ids(row_group)))
+        if candidate_id not in exclude and candidate_id not in selected:
+            selected.append(candidate_id)
+
+    if len(selected) < n:
+        # Too many rejections: fall back to exact per-row-group eligible counts
+        eligible = {}
+        for row_group in np.flatnonzero(weights):
+            ids = pool_ids(int(row_group))
+            ids = ids[~np.isin(ids, list(exclude) + selected)]
+            if len(ids):
+                eligible[int(row_group)] = ids
+        while len(selected) < n and eligible:
+            groups = list(eligible)
+            counts = np.array([len(eligible[g]) for g in groups], dtype=float)
+            row_group = groups[int(rng.choice(len(groups), p=counts / counts.sum()))]
+            ids = eligible[row_group]
+            position = int(rng.integers(len(ids)))
+            selected.append(int(ids[position]))
+            ids = np.delete(ids, position)
+            if len(ids):
+                eligible[row_group] = ids
+            else:
+                del eligible[row_group]
+
+    return selected
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rewrite candidate data as Candidate_ID-indexed parquet stores.")
+    parser.add_argument("--candidates", default=CANDIDATES_PATH)
+    parser.add_argument("--predictions", default=PREDICTIONS_PATH)
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    build_candidate_store(args.candidates, args.predictions, args.row_group_size)
+    print(f"Indexed {args.candidates} and {args.predictions}")
@@ -1,24 +1,4 @@
 import pandas as pd
-import os
-
-def load_candidates(file_path: str = "app/data/static_data.parquet") -> pd.DataFrame:
-    """
-    Load candidate data from a static Parquet file.
-
-    Parameters:
-    file_path (str): Path to the Parquet file containing candidate data.
-
-    Returns:
-    pd.DataFrame: The loaded candidate data.
-    """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found at {file_path}")
-    
-    try:
-        return pd.read_parquet(file_path)
-    except Exception as e:
-        raise RuntimeError(f"Error loading candidates from {file_path}: {e}")
-
 
 def filter_candidate_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
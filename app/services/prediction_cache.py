@@ -0,0 +1,170 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.services.candidate_store import get_candidate_rows, get_prediction_rows
+
+CACHE_SIZE = 512
+PREFETCH_WORKERS = 2
+# Cache key of a candidate's unmodified prediction
+ORIGINAL_KEY = (None, None)
+
+
+def format_prediction(candidate_id: int, row: pd.Series) -> dict:
+    """
+    Convert a static prediction row into the /predict response payload.
+
+    Parameters:
+    candidate_id (int): The ID of the candidate.
+    row (pd.Series): Original or counterfactual row from the static predictions.
+
+    Returns:
+    dict: Prediction payload with native Python types.
+    """
+    return {
+        "candidate_id": candidate_id,
+        "prediction_probability": float(round(row["Prediction_Probability"], 2)),
+        "is_good_fit": bool(row["GoodFit"]),
+        "top_features": [
+            {"Feature": feat["Feature"], "SHAP Value": float(feat["SHAP Value"])}
+            for feat in row["Top_Features"]
+        ]
+    }
+
+
+def prediction_key(row: pd.Series) -> tuple:
+    """
+    Build the cache key of a static prediction row, matching the lookup in /predict/update.
+
+    Parameters:
+    row (pd.Series): Original or counterfactual row from the static predictions.
+
+    Returns:
+    tuple: (modified attribute, new value), ORIGINAL_KEY for the unmodified prediction.
+    """
+    attribute = row["Modified_Attribute"]
+    if pd.isnull(attribute):
+        return ORIGINAL_KEY
+    if attribute == "Race":
+        return attribute, str(row["New_Race_Column"])
+    return attribute, str(row["New_Value"])
+
+
+class PredictionPrefetcher:
+    """
+    LRU cache of each candidate's full counterfactual result set, warmed in the background.
+
+    Participants in the interactive group toggle Sex, Race and Age on the candidates they were
+    just shown, so serving a pair schedules their result sets on a worker pool. Entries evicted
+    without ever being read count as wasted work.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, workers: int = PREFETCH_WORKERS):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._stats = {"prefetched": 0, "hits": 0, "misses": 0, "wasted": 0, "errors": 0}
+
+    def prefetch(self, candidate_ids: list) -> None:
+        """Schedule the counterfactual result sets of the given candidates for warming."""
+        for candidate_id in candidate_ids:
+            candidate_id = int(candidate_id)
+            with self._lock:
+                if candidate_id in self._entries or candidate_id in self._pending:
+                    continue
+                self._pending.add(candidate_id)
+            self._executor.submit(self._warm, candidate_id)
+
+    def _warm(self, candidate_id: int) -> None:
+        try:
+            # Warm the candidate row group too, /predict/update reads it to detect the change
+            get_candidate_rows([candidate_id])
+            rows = get_prediction_rows([candidate_id])
+            results = {}
+            for _, row in rows.iterrows():
+                results.setdefault(prediction_key(row), format_prediction(candidate_id, row))
+            self._store(candidate_id, results, prefetched=True)
+        except Exception as e:
+            print(f"Prefetch error for candidate {candidate_id}: {str(type(e).__name__)}: {str(e)}")
+            with self._lock:
+                self._stats["errors"] += 1
+        finally:
+            with self._lock:
+                self._pending.discard(candidate_id)
+
+    def _store(self, candidate_id: int, results: dict, prefetched: bool) -> None:
+        with self._lock:
+            if prefetched:
+                self._stats["prefetched"] += 1
+            entry = self._entries.get(candidate_id)
+            if entry is not None:
+                # Merge into the existing entry and keep its flags; a prefetch that lands after
+                # the request path already loaded the candidate was redundant work
+                for key, payload in results.items():
+                    entry["results"].setdefault(key, payload)
+                if prefetched:
+                    self._stats["wasted"] += 1
+                return
+            self._entries[candidate_id] = {"results": results, "prefetched": prefetched, "used": False}
+            while len(self._entries) > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                if evicted["prefetched"] and not evicted["used"]:
+                    self._stats["wasted"] += 1
+
+    def get(self, candidate_id: int, key: tuple):
+        """
+        Look up a cached prediction payload.
+
+        Parameters:
+        candidate_id (int): The ID of the candidate.
+        key (tuple): Key built like prediction_key, ORIGINAL_KEY for the unmodified prediction.
+
+        Returns:
+        dict | None: The cached payload, None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(candidate_id)
+            if entry is None or key not in entry["results"]:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(candidate_id)
+            entry["used"] = True
+            self._stats["hits"] += 1
+            return entry["results"][key]
+
+    def contains(self, candidate_id: int) -> bool:
+        """Return whether the full result set of a candidate is cached."""
+        with self._lock:
+            return candidate_id in self._entries
+
+    def put(self, candidate_id: int, rows: pd.DataFrame) -> None:
+        """Cache a result set read on the request path after a miss, merging into any existing entry."""
+        results = {}
+        for _, row in rows.iterrows():
+            results.setdefault(prediction_key(row), format_prediction(candidate_id, row))
+        self._store(candidate_id, results, prefetched=False)
+
+    def stats(self) -> dict:
+        """
+        Return hit-rate and wasted-work metrics.
+
+        Returns:
+        dict: Counters plus hit rate and the share of prefetched result sets evicted unused.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._entries)
+            stats["pending"] = len(self._pending)
+            unused = sum(1 for entry in self._entries.values() if entry["prefetched"] and not entry["used"])
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+        stats["wasted_rate"] = stats["wasted"] / stats["prefetched"] if stats["prefetched"] else None
+        stats["unused_cached"] = unused
+        return stats
+
+
+prediction_cache = PredictionPrefetcher()
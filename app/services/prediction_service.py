@@ -1,11 +1,16 @@
 import pickle
 import pandas as pd
-import shap
 import json
 import numpy as np
+import xgboost as xgb
+from functools import lru_cache
 
 MODEL_PATH = "models/xgb_model.pkl"
 FEATURE_LIST_PATH = "app/models/features.json"
+EXCLUDED_FEATURES = {"Age", "AgeGroup", "Sex"}
+EXCLUDED_PREFIXES = ("RaceDesc_",)
+TOP_K_FEATURES = 3
+EXPLANATION_MODES = ("native", "shap")
 
 
 def load_model(model_path: str = MODEL_PATH):
@@ -77,26 +82,129 @@ def _filter_top_features(feature_importance: pd.DataFrame) -> pd.DataFrame:
     Returns:
     pd.DataFrame: Filtered DataFrame with unwanted features removed.
     """
-    excluded_features = {"Age", "AgeGroup", "Sex"}
-    excluded_prefixes = ("RaceDesc_",)
-
     return feature_importance[
-        ~feature_importance["Feature"].isin(excluded_features) & 
-        ~feature_importance["Feature"].str.startswith(excluded_prefixes)
+        ~feature_importance["Feature"].isin(EXCLUDED_FEATURES) & 
+        ~feature_importance["Feature"].str.startswith(EXCLUDED_PREFIXES)
+    ]
+
+
+@lru_cache(maxsize=8)
+def _explainable_feature_index(columns: tuple) -> tuple:
+    """
+    Precompute the feature names and the column indices that may be shown as explanations.
+
+    Parameters:
+    columns (tuple): Column names of the model input, in order.
+
+    Returns:
+    tuple: (feature names as np.ndarray, indices of non-protected features as np.ndarray)
+    """
+    feature_names = np.asarray(columns)
+    allowed = np.array([
+        name not in EXCLUDED_FEATURES and not name.startswith(EXCLUDED_PREFIXES)
+        for name in feature_names
+    ], dtype=bool)
+    return feature_names, np.flatnonzero(allowed)
+
+
+def _top_features_from_contributions(contributions: np.ndarray, columns: tuple, k: int = TOP_K_FEATURES) -> list:
+    """
+    Select the top-k non-protected features for each row of a contribution matrix.
+
+    Parameters:
+    contributions (np.ndarray): Per-feature contributions of shape (n_rows, n_features), bias column removed.
+    columns (tuple): Feature names matching the contribution columns.
+    k (int): Number of features to return per row.
+
+    Returns:
+    list: One list of {"Feature", "SHAP Value"} records per row, sorted by value descending.
+    """
+    feature_names, allowed_idx = _explainable_feature_index(columns)
+    masked = contributions[:, allowed_idx]
+    k = min(k, masked.shape[1])
+    if k == 0:
+        return [[] for _ in range(masked.shape[0])]
+
+    # argpartition brings the k largest values to the tail in O(n_features), only those k get sorted
+    top_idx = np.argpartition(masked, -k, axis=1)[:, -k:]
+    top_vals = np.take_along_axis(masked, top_idx, axis=1)
+    order = np.argsort(-top_vals, axis=1, kind="stable")
+    top_idx = np.take_along_axis(top_idx, order, axis=1)
+    top_vals = np.take_along_axis(top_vals, order, axis=1)
+    top_names = feature_names[allowed_idx[top_idx]]
+
+    return [
+        [{"Feature": str(name), "SHAP Value": float(value)} for name, value in zip(names, values)]
+        for names, values in zip(top_names, top_vals)
     ]
 
 
-def predict_candidate(candidate_row: pd.Series, model: object) -> dict:
+def explain_candidates_native(prepared_data: pd.DataFrame, model: object, batch_size: int = 1024) -> list:
+    """
+    Compute top feature explanations from the booster's native per-feature contributions.
+
+    XGBoost's pred_contribs output is the exact TreeSHAP attribution in margin space, so this
+    yields the same values as shap.TreeExplainer without importing shap.
+
+    Parameters:
+    prepared_data (pd.DataFrame): Numeric model input with columns in feature list order.
+    model (object): The pre-trained XGBoost model.
+    batch_size (int): Number of rows scored per booster call.
+
+    Returns:
+    list: One list of top feature records per input row.
+    """
+    booster = model.get_booster()
+    columns = tuple(prepared_data.columns)
+    top_features = []
+    for start in range(0, len(prepared_data), batch_size):
+        batch = prepared_data.iloc[start:start + batch_size]
+        dmatrix = xgb.DMatrix(batch, feature_names=list(columns))
+        contributions = booster.predict(dmatrix, pred_contribs=True)
+        # Last column is the bias term
+        top_features.extend(_top_features_from_contributions(contributions[:, :-1], columns))
+    return top_features
+
+
+def _explain_candidate_shap(prepared_data: pd.DataFrame, model: object) -> list:
+    """
+    Compute top feature explanations for a single prepared row with the shap library.
+
+    Parameters:
+    prepared_data (pd.DataFrame): Numeric model input for one candidate.
+    model (object): The pre-trained XGBoost model.
+
+    Returns:
+    list: Top feature records for the candidate.
+    """
+    import shap
+
+    explainer = shap.TreeExplainer(model)
+    shap_values = explainer(prepared_data)
+    feature_importance = pd.DataFrame({
+        'Feature': prepared_data.columns,
+        'SHAP Value': shap_values.values[0]
+    }).sort_values(by='SHAP Value', ascending=False)
+
+    feature_importance = _filter_top_features(feature_importance)
+    return feature_importance.head(TOP_K_FEATURES).to_dict(orient="records")
+
+
+def predict_candidate(candidate_row: pd.Series, model: object, explanation_mode: str = "native") -> dict:
     """
     Predict if a candidate is a good fit using the XGBoost model.
 
     Parameters:
     candidate_row (pd.Series): Row data for the selected candidate.
     model (object): The pre-trained XGBoost model.
+    explanation_mode (str): "native" for booster contributions, "shap" for shap.TreeExplainer.
 
     Returns:
     dict: Prediction result including the probability and fit status.
     """
+    if explanation_mode not in EXPLANATION_MODES:
+        raise ValueError(f"Unknown explanation mode: {explanation_mode}")
+
     try:
         prepared_data = _prepare_candidate_for_prediction(candidate_row)
         prepared_data = prepared_data.apply(pd.to_numeric, errors='coerce')
@@ -105,16 +213,11 @@ def predict_candidate(candidate_row: pd.Series, model: object) -> dict:
         prediction_proba = float(model.predict_proba(prepared_data)[:, 1][0])
         is_good_fit = prediction_proba >= 0.5
 
-        # Compute SHAP values
-        explainer = shap.TreeExplainer(model)
-        shap_values = explainer(prepared_data)
-        feature_importance = pd.DataFrame({
-            'Feature': prepared_data.columns,
-            'SHAP Value': shap_values.values[0]
-        }).sort_values(by='SHAP Value', ascending=False)
-
-        feature_importance = _filter_top_features(feature_importance)
-        top_features = feature_importance.head(3).to_dict(orient="records")
+        # Compute feature contributions
+        if explanation_mode == "native":
+            top_features = explain_candidates_native(prepared_data, model)[0]
+        else:
+            top_features = _explain_candidate_shap(prepared_data, model)
 
         if np.isnan(prediction_proba):
             prediction_proba = 0.0
@@ -0,0 +1,235 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+RECORDING_PATH_ENV = "REQUEST_RECORDING_PATH"
+# Set only by the replay harness; live deployments ignore the seed header
+REPLAY_ENABLED_ENV = "REQUEST_REPLAY_ENABLED"
+SEED_HEADER = "X-Replay-Seed"
+# Server-side latency reported to the replay harness, measured where the recorder measures it
+LATENCY_HEADER = "X-Replay-Latency-Ms"
+SEED_BITS = 128
+# Fields that may identify a participant, hashed before a request is written to disk
+ANONYMIZED_FIELDS = {"user_id", "feedback_answers"}
+# Only these paths consume a seed, everything else is recorded with seed None
+SEEDED_PATHS = {"/candidates/data", "/session/start", "/round/next"}
+
+
+def request_seed(request: Request):
+    """
+    Return the random seed assigned to the current request, or None when not recording/replaying.
+
+    Parameters:
+    request (Request): The incoming request.
+
+    Returns:
+    int | None: Seed to initialise the request's random generator with.
+    """
+    return getattr(request.state, "seed", None)
+
+
+def _header_seed(request: Request, replay_enabled: bool):
+    """
+    Read a replayed seed from the X-Replay-Seed header.
+
+    Returns:
+    int | None: The seed, None if replay is disabled, the path is unseeded or no header was sent.
+
+    Raises:
+    ValueError: If the header is not an integer.
+    """
+    if not replay_enabled or request.url.path not in SEEDED_PATHS:
+        return None
+    header_seed = request.headers.get(SEED_HEADER)
+    return int(header_seed) if header_seed is not None else None
+
+
+def _invalid_seed_response() -> JSONResponse:
+    return JSONResponse(status_code=400, content={"detail": f"Invalid {SEED_HEADER} header, expected an integer."})
+
+
+def _anonymize(value):
+    """Replace strings with a stable hash while keeping dict keys, lists and numbers intact."""
+    if isinstance(value, dict):
+        return {key: _anonymize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_anonymize(item) for item in value]
+    if isinstance(value, str):
+        return "anon-" + hashlib.sha256(value.encode("utf-8")).hexdigest()[:12]
+    return value
+
+
+def _anonymize_fields(payload):
+    """Anonymize the participant-identifying fields of a JSON value, at any depth."""
+    if isinstance(payload, dict):
+        return {
+            key: _anonymize(value) if key in ANONYMIZED_FIELDS else _anonymize_fields(value)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, list):
+        return [_anonymize_fields(item) for item in payload]
+    return payload
+
+
+def _parse_json(raw: bytes):
+    """Parse a JSON body, returning None for empty or non-JSON content."""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class RequestRecorder:
+    """
+    Append anonymized request/response pairs with timing to a JSONL file.
+
+    Each line holds the method, path, anonymized query and body, the seed handed to the endpoint,
+    the response status and anonymized JSON body, the latency and the offset from the first
+    recorded request. With replay enabled, the latency is also returned in the X-Replay-Latency-Ms
+    header; without a path nothing is written, so replays are timed exactly like recordings.
+    """
+
+    def __init__(self, path: str = None, replay_enabled: bool = False):
+        self.path = path
+        self.replay_enabled = replay_enabled
+        self._start = None
+        self._writer = None
+        if not path:
+            return
+        # File I/O runs on a writer thread so recording never blocks the event loop
+        self._queue = queue.Queue()
+        # Opened here so a bad path fails at startup rather than silently on the writer thread
+        self._file = open(path, "a")
+        self._writer = threading.Thread(target=self._write_loop, name="request-recorder", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        with self._file as file:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                file.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    file.flush()
+
+    def write(self, record: dict) -> None:
+        """Queue a record for the writer thread."""
+        if self._writer is not None:
+            self._queue.put(record)
+
+    def close(self) -> None:
+        """Write out the queued records and stop the writer thread."""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    async def __call__(self, request: Request, call_next):
+        try:
+            seed = _header_seed(request, self.replay_enabled)
+        except ValueError:
+            return _invalid_seed_response()
+        if seed is None and request.url.path in SEEDED_PATHS:
+            # Wide enough that session IDs derived from it keep UUID4-level entropy
+            seed = secrets.randbits(SEED_BITS)
+        request.state.seed = seed
+
+        request_body = await request.body()
+        timestamp = time.time()
+        started = time.perf_counter()
+        # Offsets count from the earliest request start, not the first response; lines are
+        # written in completion order, so concurrent requests may appear out of offset order
+        if self._start is None or timestamp < self._start:
+            self._start = timestamp
+        response = await call_next(request)
+
+        is_json = response.headers.get("content-type", "").startswith("application/json")
+        if not is_json:
+            # Streamed exports and static files pass through unbuffered, timed to the first byte
+            record = self._record(request, request_body, seed, timestamp, started, response.status_code, None)
+            self.write(record)
+            if self.replay_enabled:
+                response.headers[LATENCY_HEADER] = str(record["latency_ms"])
+            return response
+
+        response_body = b"".join([chunk async for chunk in response.body_iterator])
+        record = self._record(
+            request, request_body, seed, timestamp, started, response.status_code, _parse_json(response_body)
+        )
+        self.write(record)
+
+        headers = dict(response.headers)
+        if self.replay_enabled:
+            headers[LATENCY_HEADER] = str(record["latency_ms"])
+        return Response(
+            content=response_body,
+            status_code=response.status_code,
+            headers=headers,
+            media_type=response.media_type,
+        )
+
+    def _record(self, request: Request, request_body: bytes, seed, timestamp: float, started: float, status: int, response_json) -> dict:
+        return {
+            "timestamp": timestamp,
+            "method": request.method,
+            "path": request.url.path,
+            "query": [
+                [key, _anonymize(value) if key in ANONYMIZED_FIELDS else value]
+                for key, value in request.query_params.multi_items()
+            ],
+            "body": _anonymize_fields(_parse_json(request_body)),
+            "seed": seed,
+            "status": status,
+            # Responses echo stored rows, e.g. /session/end returns the inserted feedback_answers
+            "response": _anonymize_fields(response_json),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "offset": timestamp - self._start,
+        }
+
+
+def replay_seed_middleware(replay_enabled: bool):
+    """
+    Build a pass-through middleware that hands replayed seeds to the endpoints.
+
+    Parameters:
+    replay_enabled (bool): Honour the X-Replay-Seed header. Without it every request gets seed None.
+
+    Returns:
+    callable: An HTTP middleware for app.middleware("http").
+    """
+    async def seed_middleware(request: Request, call_next):
+        try:
+            request.state.seed = _header_seed(request, replay_enabled)
+        except ValueError:
+            return _invalid_seed_response()
+        return await call_next(request)
+
+    return seed_middleware
+
+
+def recording_middleware():
+    """
+    Build the request middleware: the recorder if REQUEST_RECORDING_PATH or
+    REQUEST_REPLAY_ENABLED is set (replays are timed by the same code as recordings), otherwise
+    a pass-through. Seeds from the X-Replay-Seed header are only honoured when
+    REQUEST_REPLAY_ENABLED is set, so participants cannot choose their group or candidates.
+
+    Returns:
+    callable: An HTTP middleware for app.middleware("http").
+    """
+    path = os.getenv(RECORDING_PATH_ENV)
+    replay_enabled = os.getenv(REPLAY_ENABLED_ENV) == "1"
+    if not path and not replay_enabled:
+        return replay_seed_middleware(replay_enabled)
+    return RequestRecorder(path or None, replay_enabled=replay_enabled)
@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from app.services.request_recorder import LATENCY_HEADER, RECORDING_PATH_ENV, REPLAY_ENABLED_ENV, SEED_HEADER
+
+# Requests that write to external services are skipped unless explicitly included
+WRITE_PATHS = {"/session/end"}
+# Response fields that legitimately differ between runs (wall-clock times)
+VOLATILE_FIELDS = {"start", "created_at", "session_time"}
+
+
+def load_recording(path: str) -> list:
+    """
+    Load a JSONL recording written by the request recorder.
+
+    Parameters:
+    path (str): Path to the recording.
+
+    Returns:
+    list: Recorded request/response entries, in the order the requests started.
+    """
+    with open(path, "r") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    # Lines are written as responses complete; replay and diffs follow the start order
+    records.sort(key=lambda record: record.get("offset", 0))
+    return records
+
+
+def replay(records: list, speed: float = None, include_writes: bool = False, client=None) -> list:
+    """
+    Push a recording through the app in-process and capture the new responses.
+
+    Recorded seeds are sent back in the X-Replay-Seed header, so /candidates/data, /round/next and
+    /session/start draw the same candidates, session IDs and user groups as in the recording.
+    Replay should start from a fresh app process, as the in-memory session and candidate
+    state is part of what is being reproduced. Latencies are read from the X-Replay-Latency-Ms
+    header, measured by the recorder middleware just like the recorded ones, so client overhead
+    does not show up as a regression. Clients whose app does not send the header are timed
+    client-side; compare those only against other replay outputs.
+
+    Parameters:
+    records (list): Entries from load_recording.
+    speed (float): 1.0 replays at the original pace, 10.0 ten times faster, None as fast as possible.
+    include_writes (bool): Also replay requests that write to Supabase (e.g. /session/end).
+    client: Optional HTTP client with a .request() method, defaults to a TestClient on app.main.app
+        built with seed replay enabled and recording forced off.
+
+    Returns:
+    list: One entry per replayed request, in the recorder's format.
+    """
+    if client is None:
+        # Must be set before app.main is imported: the middleware is built at import time and an
+        # existing (even empty) variable is not overridden by load_dotenv()
+        os.environ[REPLAY_ENABLED_ENV] = "1"
+        os.environ[RECORDING_PATH_ENV] = ""
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+
+    results = []
+    replay_start = time.perf_counter()
+    for record in records:
+        if record["path"] in WRITE_PATHS and not include_writes:
+            continue
+
+        if speed:
+            wait = record.get("offset", 0) / speed - (time.perf_counter() - replay_start)
+            if wait > 0:
+                time.sleep(wait)
+
+        headers = {}
+        if record.get("seed") is not None:
+            headers[SEED_HEADER] = str(record["seed"])
+
+        started = time.perf_counter()
+        response = client.request(
+            record["method"],
+            record["path"],
+            params=[tuple(pair) for pair in record.get("query", [])],
+            json=record.get("body"),
+            headers=headers,
+        )
+        client_latency_ms = (time.perf_counter() - started) * 1000
+        latency_ms = float(response.headers.get(LATENCY_HEADER, client_latency_ms))
+
+        is_json = response.headers.get("content-type", "").startswith("application/json")
+        results.append({
+            "method": record["method"],
+            "path": record["path"],
+            "query": record.get("query", []),
+            "body": record.get("body"),
+            "seed": record.get("seed"),
+            "status": response.status_code,
+            "response": response.json() if is_json else None,
+            "latency_ms": latency_ms,
+            "offset": started - replay_start,
+        })
+
+    return results
+
+
+def _strip_volatile(value):
+    """Drop wall-clock fields so responses can be compared across runs."""
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def _latency_summary(entries: list) -> dict:
+    """Summarise latencies per path as count, p50 and p95 in milliseconds."""
+    by_path = {}
+    for entry in entries:
+        by_path.setdefault(entry["path"], []).append(entry["latency_ms"])
+    return {
+        path: {
+            "count": len(latencies),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        }
+        for path, latencies in by_path.items()
+    }
+
+
+def diff_results(baseline: list, replayed: list, include_writes: bool = False) -> dict:
+    """
+    Compare replayed responses and latencies against a baseline.
+
+    Parameters:
+    baseline (list): The original recording or an earlier replay output.
+    replayed (list): Output of replay().
+    include_writes (bool): Whether write requests were part of the replay.
+
+    Returns:
+    dict: Response mismatches and per-path latency percentiles for both runs.
+    """
+    baseline = [entry for entry in baseline if include_writes or entry["path"] not in WRITE_PATHS]
+    mismatches = []
+    for position, (expected, actual) in enumerate(zip(baseline, replayed)):
+        if expected["path"] != actual["path"] or expected["method"] != actual["method"]:
+            mismatches.append({"position": position, "reason": "request order differs",
+                               "expected": expected["path"], "actual": actual["path"]})
+            continue
+        if expected["status"] != actual["status"]:
+            mismatches.append({"position": position, "path": actual["path"], "reason": "status",
+                               "expected": expected["status"], "actual": actual["status"]})
+        elif _strip_volatile(expected["response"]) != _strip_volatile(actual["response"]):
+            mismatches.append({"position": position, "path": actual["path"], "reason": "response",
+                               "expected": expected["response"], "actual": actual["response"]})
+
+    if len(baseline) != len(replayed):
+        mismatches.append({"reason": "length", "expected": len(baseline), "actual": len(replayed)})
+
+    baseline_latency = _latency_summary(baseline)
+    replay_latency = _latency_summary(replayed)
+    latency = {
+        path: {
+            "baseline": baseline_latency.get(path),
+            "replay": summary,
+            "p50_ratio": summary["p50_ms"] / baseline_latency[path]["p50_ms"]
+            if baseline_latency.get(path) and baseline_latency[path]["p50_ms"] else None,
+        }
+        for path, summary in replay_latency.items()
+    }
+
+    return {"requests": len(replayed), "mismatches": mismatches, "latency": latency}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded request log against the app and diff the results.")
+    parser.add_argument("recording", help="JSONL recording written with REQUEST_RECORDING_PATH set.")
+    parser.add_argument("--baseline", help="Recording or replay output to compare against (defaults to the recording).")
+    parser.add_argument("--speed", type=float, default=None, help="Pace multiplier, 1.0 = original pace, omit for max speed.")
+    parser.add_argument("--output", help="Write the replay results as JSONL, usable as a later --baseline.")
+    parser.add_argument("--include-writes", action="store_true", help="Also replay /session/end (writes to Supabase).")
+    args = parser.parse_args()
+
+    records = load_recording(args.recording)
+    results = replay(records, speed=args.speed, include_writes=args.include_writes)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            for entry in results:
+                file.write(json.dumps(entry, default=str) + "\n")
+
+    baseline = load_recording(args.baseline) if args.baseline else records
+    report = diff_results(baseline, results, include_writes=args.include_writes)
+    print(json.dumps(report, indent=2, default=str))
@@ -0,0 +1,179 @@
+import datetime
+import io
+import json
+
+import pyarrow as pa
+
+SESSION_RESULTS_TABLE = "session_results"
+EXPORT_PAGE_SIZE = 500
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+# Nested fields (rounds, feedback answers) are exported as JSON strings to keep one flat schema
+EXPORT_SCHEMA = pa.schema([
+    ("session_id", pa.string()),
+    ("user_group", pa.string()),
+    ("session_time", pa.float64()),
+    ("rounds", pa.string()),
+    ("feedback_time", pa.float64()),
+    ("feedback_answers", pa.string()),
+    ("created_at", pa.string()),
+])
+
+
+def iter_session_results(
+    client,
+    user_group: str = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+):
+    """
+    Page through the stored session results, holding at most one page in memory.
+
+    Parameters:
+    client: Supabase client of the session-results sink.
+    user_group (str): Only export sessions of this user group.
+    since (datetime): Only export sessions that ended at or after this time.
+    until (datetime): Only export sessions that ended before this time.
+    page_size (int): Rows fetched per request to the sink.
+
+    Yields:
+    dict: One stored session result per row, ordered by created_at and session_id.
+    """
+    last_key = None
+    while True:
+        query = client.table(SESSION_RESULTS_TABLE).select("*")
+        if user_group is not None:
+            query = query.eq("user_group", user_group)
+        if since is not None:
+            query = query.gte("created_at", since.isoformat())
+        if until is not None:
+            query = query.lt("created_at", until.isoformat())
+        if last_key is not None:
+            # Keyset pagination on (created_at, session_id): stable under equal timestamps and
+            # no offset scan per page
+            created_at, session_id = last_key
+            query = query.or_(
+                f'created_at.gt."{created_at}",'
+                f'and(created_at.eq."{created_at}",session_id.gt."{session_id}")'
+            )
+        rows = (
+            query.order("created_at")
+            .order("session_id")
+            .limit(page_size)
+            .execute()
+            .data
+        )
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_key = (rows[-1]["created_at"], rows[-1]["session_id"])
+
+
+def iter_ndjson(rows):
+    """
+    Serialize session results as newline-delimited JSON.
+
+    Parameters:
+    rows: Iterable of session result dicts.
+
+    Yields:
+    bytes: One encoded line per session.
+    """
+    for row in rows:
+        yield (json.dumps(row, default=str) + "\n").encode("utf-8")
+
+
+def _to_export_record(row: dict) -> dict:
+    """Flatten a session result into the export schema."""
+    record = {field.name: row.get(field.name) for field in EXPORT_SCHEMA}
+    for field in ("rounds", "feedback_answers"):
+        if record[field] is not None and not isinstance(record[field], str):
+            record[field] = json.dumps(record[field], default=str)
+    if record["created_at"] is not None:
+        record["created_at"] = str(record["created_at"])
+    return record
+
+
+def iter_arrow_ipc(rows, batch_size: int = EXPORT_PAGE_SIZE):
+    """
+    Serialize session results as an Arrow IPC stream, one record batch at a time.
+
+    Parameters:
+    rows: Iterable of session result dicts.
+    batch_size (int): Rows per record batch.
+
+    Yields:
+    bytes: Chunks of the IPC stream (schema, record batches, end-of-stream marker).
+    """
+    buffer = io.BytesIO()
+    writer = pa.ipc.new_stream(buffer, EXPORT_SCHEMA)
+
+    def flush() -> bytes:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    batch = []
+    for row in rows:
+        batch.append(_to_export_record(row))
+        if len(batch) >= batch_size:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=EXPORT_SCHEMA))
+            batch = []
+            yield flush()
+    if batch:
+        writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=EXPORT_SCHEMA))
+    writer.close()
+    yield flush()
+
+
+def export_session_results(client, export_format: str = "ndjson", **filters):
+    """
+    Stream stored session results in the requested format.
+
+    Parameters:
+    client: Supabase client of the session-results sink.
+    export_format (str): "ndjson" or "arrow".
+    **filters: user_group, since and until, passed to iter_session_results.
+
+    Returns:
+    generator: Encoded chunks of the export.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    rows = iter_session_results(client, **filters)
+    return iter_ndjson(rows) if export_format == "ndjson" else iter_arrow_ipc(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(description="Export stored session results as NDJSON or Arrow IPC.")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--user-group", help='e.g. "no-xai", "badge", "predictions" or "interactive".')
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, help="ISO timestamp, inclusive.")
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat, help="ISO timestamp, exclusive.")
+    parser.add_argument("--output", help="Output file, defaults to stdout.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    chunks = export_session_results(
+        supabase, args.format, user_group=args.user_group, since=args.since, until=args.until
+    )
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
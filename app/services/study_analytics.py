@@ -0,0 +1,154 @@
+import math
+import threading
+
+# Relative accuracy of the latency quantiles
+SKETCH_ACCURACY = 0.02
+SKETCH_QUANTILES = (0.5, 0.9, 0.99)
+UNKNOWN_GROUP = "unknown"
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch with constant-time updates.
+
+    Values are counted in buckets whose bounds grow geometrically, so any quantile is returned
+    within SKETCH_ACCURACY relative error and the number of buckets depends only on the value
+    range, not on how many values were added.
+    """
+
+    def __init__(self, accuracy: float = SKETCH_ACCURACY):
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets = {}
+        self._zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        value = max(float(value), 0.0)
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value == 0.0:
+            self._zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+
+    def quantile(self, q: float):
+        """Return the approximate q-quantile, None if the sketch is empty."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                # Bucket midpoint keeps the relative error within the configured accuracy
+                estimate = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        summary = {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q in SKETCH_QUANTILES:
+            summary[f"p{int(q * 100)}"] = self.quantile(q)
+        return summary
+
+
+def _new_group_stats() -> dict:
+    return {
+        "sessions_started": 0,
+        "sessions_ended": 0,
+        "rounds_started": 0,
+        "invites": 0,
+        "good_fit_invites": 0,
+        "round_time": QuantileSketch(),
+        "session_time": QuantileSketch(),
+    }
+
+
+class StudyAnalytics:
+    """
+    Running per-user-group study statistics, updated as the study endpoints are called.
+
+    Counters and sketches are updated incrementally, so reading the current statistics never
+    rescans stored sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._session_groups = {}
+
+    def _group(self, user_group: str) -> dict:
+        return self._groups.setdefault(user_group or UNKNOWN_GROUP, _new_group_stats())
+
+    def record_session_start(self, session_id: str, user_group: str) -> None:
+        with self._lock:
+            self._session_groups[session_id] = user_group
+            self._group(user_group)["sessions_started"] += 1
+
+    def record_round_start(self, user_group: str, previous_round_seconds: float = None) -> None:
+        """Count a started round; the time since the previous round start is its round time."""
+        with self._lock:
+            stats = self._group(user_group)
+            stats["rounds_started"] += 1
+            if previous_round_seconds is not None:
+                stats["round_time"].add(previous_round_seconds)
+
+    def record_invite(self, session_id: str, is_good_fit: bool) -> None:
+        with self._lock:
+            stats = self._group(self._session_groups.get(session_id))
+            stats["invites"] += 1
+            if is_good_fit:
+                stats["good_fit_invites"] += 1
+
+    def record_session_end(
+        self, session_id: str, user_group: str, session_seconds: float, final_round_seconds: float = None
+    ) -> None:
+        """Count a stored session; the last round's time runs until the session ends."""
+        with self._lock:
+            self._session_groups.pop(session_id, None)
+            stats = self._group(user_group)
+            stats["sessions_ended"] += 1
+            stats["session_time"].add(session_seconds)
+            if final_round_seconds is not None:
+                stats["round_time"].add(final_round_seconds)
+
+    def snapshot(self) -> dict:
+        """
+        Return the current statistics of every user group.
+
+        Returns:
+        dict: user_group -> counters, invite and good-fit pick rates and time summaries (seconds).
+        """
+        with self._lock:
+            result = {}
+            for user_group, stats in self._groups.items():
+                result[user_group] = {
+                    "sessions_started": stats["sessions_started"],
+                    "sessions_ended": stats["sessions_ended"],
+                    "rounds_started": stats["rounds_started"],
+                    "invites": stats["invites"],
+                    "good_fit_invites": stats["good_fit_invites"],
+                    "invites_per_round": stats["invites"] / stats["rounds_started"] if stats["rounds_started"] else None,
+                    "good_fit_pick_rate": stats["good_fit_invites"] / stats["invites"] if stats["invites"] else None,
+                    "completion_rate": stats["sessions_ended"] / stats["sessions_started"] if stats["sessions_started"] else None,
+                    "round_time": stats["round_time"].summary(),
+                    "session_time": stats["session_time"].summary(),
+                }
+            return result
+
+
+study_analytics = StudyAnalytics()